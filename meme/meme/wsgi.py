@@ -5,3 +5,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'meme.settings')
 
 application = get_wsgi_application()
+
+# Прогрев до первого запроса (с gunicorn --preload — один раз в master-процессе)
+from memes.warmup import warm_up  # noqa: E402
+warm_up()
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Mem, Profile
+from .models import Category, Mem, Profile, TemplateUsage
 
 
 @admin.register(Category)
@@ -17,4 +17,10 @@ class MemeAdmin(admin.ModelAdmin):
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'created_at')
-    search_fields = ('user__username', 'bio')
\ No newline at end of file
+    search_fields = ('user__username', 'bio')
+
+
+@admin.register(TemplateUsage)
+class TemplateUsageAdmin(admin.ModelAdmin):
+    list_display = ('template_id', 'day', 'opens', 'saves')
+    list_filter = ('day',)
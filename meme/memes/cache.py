@@ -0,0 +1,50 @@
+"""Кэш состояния аутентификации: пользователь вместе с профилем"""
+from django.conf import settings
+from django.contrib.auth import HASH_SESSION_KEY, SESSION_KEY, get_user, get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.crypto import constant_time_compare
+
+from .models import Profile
+
+# Увеличить при изменении моделей User/Profile — старые записи перестанут читаться
+USER_CACHE_VERSION = 1
+
+
+def user_cache_key(user_id):
+    return f'memes:user:v{USER_CACHE_VERSION}:{user_id}'
+
+
+def get_cached_user(request):
+    """Пользователь из кэша; при промахе — обычная загрузка через сессию.
+
+    Профиль подгружается сразу и кэшируется вместе с пользователем,
+    поэтому user.profile в шаблонах не делает запросов.
+    """
+    user_id = request.session.get(SESSION_KEY)
+    if user_id is None:
+        return get_user(request)
+
+    user = cache.get(user_cache_key(user_id))
+    if user is not None:
+        # Та же проверка, что в django.contrib.auth.get_user: смена пароля
+        # делает сессию недействительной. При несовпадении — полный путь.
+        session_hash = request.session.get(HASH_SESSION_KEY)
+        if session_hash and constant_time_compare(session_hash, user.get_session_auth_hash()):
+            return user
+
+    user = get_user(request)
+    if user.is_authenticated:
+        # В общий кэш кладём только данные основной БД: реплика может отставать
+        # и вернуть в кэш состояние, которое сигналы только что инвалидировали
+        user = get_user_model().objects.db_manager(DEFAULT_DB_ALIAS).select_related('profile').get(pk=user.pk)
+        try:
+            user.profile
+        except Profile.DoesNotExist:
+            pass
+        cache.set(user_cache_key(user.pk), user, settings.USER_CACHE_TIMEOUT)
+    return user
+
+
+def invalidate_user_cache(user_id):
+    cache.delete(user_cache_key(user_id))
@@ -0,0 +1,57 @@
+"""Маршрутизация запросов: запись — в основную БД, чтение — в реплики"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Состояние текущего запроса; выставляется PrimaryPinMiddleware
+_use_primary = ContextVar('use_primary', default=False)
+_has_written = ContextVar('has_written', default=None)
+
+
+def begin_request(use_primary):
+    """Начинает запрос: читать ли с основной БД и сброс признака записи"""
+    return _use_primary.set(use_primary), _has_written.set([False])
+
+
+def end_request(tokens):
+    """Возвращает состояние и сообщает, была ли запись за время запроса"""
+    use_primary_token, written_token = tokens
+    written = _has_written.get()
+    _use_primary.reset(use_primary_token)
+    _has_written.reset(written_token)
+    return bool(written and written[0])
+
+
+class PrimaryReplicaRouter:
+    """Чтение — со случайной реплики из DATABASE_REPLICAS, запись — в default.
+
+    После записи запрос до конца читает с основной БД, а PrimaryPinMiddleware
+    закрепляет за пользователем основную БД на DATABASE_PRIMARY_PIN_SECONDS,
+    чтобы он сразу видел свои изменения несмотря на отставание реплик.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            not settings.DATABASE_REPLICAS
+            or _use_primary.get()
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        written = _has_written.get()
+        if written is not None:
+            written[0] = True
+        _use_primary.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Все базы содержат одни и те же данные
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики получают схему через репликацию с основной БД
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,136 @@
+"""Документ редактора мема и применение JSON Patch (RFC 6902) к нему"""
+import copy
+import json
+import math
+
+from django.conf import settings
+
+# Версия схемы документа: {"schema": 1, "template_id": int | None, "texts": [...]}
+DOCUMENT_SCHEMA = 1
+
+DOCUMENT_FIELDS = {'schema', 'template_id', 'texts'}
+
+# Поле текстового слоя -> допустимые типы; text, x и y обязательны
+NUMBER = (int, float)
+TEXT_FIELDS = {
+    'text': str,
+    'x': NUMBER,
+    'y': NUMBER,
+    'fontSize': NUMBER,
+    'fontFamily': str,
+    'color': str,
+    'strokeColor': str,
+    'strokeWidth': NUMBER,
+    'align': str,
+}
+REQUIRED_TEXT_FIELDS = {'text', 'x', 'y'}
+TEXT_ALIGNS = {'left', 'center', 'right'}
+
+
+class DocumentError(ValueError):
+    """Некорректный документ или патч"""
+
+
+def _parse_pointer(path):
+    """JSON Pointer -> список ключей"""
+    if not isinstance(path, str) or not path.startswith('/'):
+        raise DocumentError(f'Некорректный путь: {path!r}')
+    return [part.replace('~1', '/').replace('~0', '~') for part in path[1:].split('/')]
+
+
+def _resolve(document, parts):
+    """Контейнер и последний ключ для пути"""
+    target = document
+    for part in parts[:-1]:
+        if isinstance(target, list):
+            if not part.isdigit() or int(part) >= len(target):
+                raise DocumentError(f'Нет элемента {part}')
+            target = target[int(part)]
+        elif isinstance(target, dict) and part in target:
+            target = target[part]
+        else:
+            raise DocumentError(f'Нет ключа {part}')
+    return target, parts[-1]
+
+
+def apply_patch(document, operations):
+    """Применяет операции add/remove/replace; исходный документ не меняется"""
+    if not isinstance(operations, list):
+        raise DocumentError('Патч должен быть списком операций')
+
+    document = copy.deepcopy(document)
+    for operation in operations:
+        if not isinstance(operation, dict):
+            raise DocumentError('Операция должна быть объектом')
+        op = operation.get('op')
+        target, key = _resolve(document, _parse_pointer(operation.get('path')))
+
+        if isinstance(target, list):
+            if key == '-' and op == 'add':
+                index = len(target)
+            elif key.isdigit() and int(key) < len(target) + (op == 'add'):
+                index = int(key)
+            else:
+                raise DocumentError(f'Некорректный индекс {key}')
+        elif not isinstance(target, dict):
+            raise DocumentError('Путь указывает внутрь значения')
+
+        if op in ('add', 'replace'):
+            if 'value' not in operation:
+                raise DocumentError('Нет значения в операции')
+            if isinstance(target, list):
+                if op == 'add':
+                    target.insert(index, operation['value'])
+                else:
+                    target[index] = operation['value']
+            else:
+                if op == 'replace' and key not in target:
+                    raise DocumentError(f'Нет ключа {key}')
+                target[key] = operation['value']
+        elif op == 'remove':
+            if isinstance(target, list):
+                del target[index]
+            elif key in target:
+                del target[key]
+            else:
+                raise DocumentError(f'Нет ключа {key}')
+        else:
+            raise DocumentError(f'Неподдерживаемая операция: {op!r}')
+    return document
+
+
+def _validate_text(text):
+    """Текстовый слой: обязательные поля и типы значений"""
+    if not isinstance(text, dict) or not REQUIRED_TEXT_FIELDS <= set(text) <= set(TEXT_FIELDS):
+        raise DocumentError('Некорректный текстовый слой')
+    for field, value in text.items():
+        # bool — подкласс int, но координатой или размером быть не может
+        if isinstance(value, bool) or not isinstance(value, TEXT_FIELDS[field]):
+            raise DocumentError(f'Некорректное значение поля {field}')
+        # json.loads пропускает NaN и Infinity, а JSONField их сохранить не может
+        if isinstance(value, float) and not math.isfinite(value):
+            raise DocumentError(f'Некорректное значение поля {field}')
+    if 'align' in text and text['align'] not in TEXT_ALIGNS:
+        raise DocumentError('Некорректное значение поля align')
+
+
+def validate_document(document):
+    """Проверяет структуру и размер документа"""
+    if not isinstance(document, dict):
+        raise DocumentError('Документ должен быть объектом')
+    if not set(document) <= DOCUMENT_FIELDS:
+        raise DocumentError('Неизвестные поля документа')
+    template_id = document.get('template_id')
+    if isinstance(template_id, bool) or not isinstance(template_id, (int, type(None))):
+        raise DocumentError('template_id должен быть числом')
+    texts = document.get('texts')
+    if not isinstance(texts, list):
+        raise DocumentError('В документе нет списка текстов')
+    if len(texts) > settings.MEME_DOCUMENT_MAX_TEXTS:
+        raise DocumentError('Слишком много текстов')
+    for text in texts:
+        _validate_text(text)
+    if len(json.dumps(document, ensure_ascii=False)) > settings.MEME_DOCUMENT_MAX_SIZE:
+        raise DocumentError('Документ слишком большой')
+    document['schema'] = DOCUMENT_SCHEMA
+    return document
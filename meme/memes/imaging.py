@@ -0,0 +1,46 @@
+"""Кодирование изображений без зависимостей от Django.
+
+Функции отсюда выполняются в дочерних процессах ProcessPoolExecutor: при
+запуске spawn/forkserver ребёнок импортирует только этот модуль, поэтому в нём
+нельзя импортировать модели и всё, что требует готового реестра приложений.
+"""
+import io
+
+from PIL import Image
+
+
+def reencode_image(data, image_format, quality):
+    """Перекодирует байты изображения.
+
+    Возвращает новые байты или None, если файл не изображение или анимирован.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            if getattr(image, 'n_frames', 1) > 1:
+                return None
+            image.load()
+            if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+                image = _flatten(image)
+            params = {'quality': quality}
+            if image_format == 'WEBP':
+                params['method'] = 4
+            elif image_format == 'JPEG':
+                params['optimize'] = True
+            output = io.BytesIO()
+            image.save(output, format=image_format, **params)
+            return output.getvalue()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        # DecompressionBombError наследует Exception напрямую, а не OSError
+        return None
+
+
+def _flatten(image):
+    """RGB-копия изображения: прозрачные области становятся белыми, а не чёрными"""
+    if image.mode == 'P':
+        image = image.convert('RGBA')
+    if image.mode in ('RGBA', 'LA', 'PA'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
@@ -0,0 +1,170 @@
+"""Сборщик мусора для медиа: удаляет файлы, на которые не ссылается ни одна запись"""
+import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from memes.models import Mem, Profile
+from memes.storage import iter_files, lists_in_order
+
+
+# Каталог в хранилище -> поля, которые могут ссылаться на файлы из него.
+# meme_templates/ и user_images/ остались от моделей, удалённых в 0002:
+# ссылок на них больше нет, поэтому всё их содержимое — мусор.
+MEDIA_REFERENCES = {
+    'user_memes/': [(Mem, 'custom_image')],
+    'avatars/': [(Profile, 'avatar')],
+    'meme_templates/': [],
+    'user_images/': [],
+}
+
+
+class Command(BaseCommand):
+    help = 'Удаляет осиротевшие файлы из user_memes/, avatars/ и каталогов удалённых моделей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать, что будет удалено')
+        parser.add_argument('--grace-hours', type=float, default=24,
+                            help='Не трогать файлы моложе этого возраста (часы)')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Сколько имён проверять одним IN-запросом')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Сколько пачек обрабатывать параллельно')
+        parser.add_argument('--prefix', action='append', choices=sorted(MEDIA_REFERENCES),
+                            help='Обработать только указанный каталог (можно повторять)')
+        parser.add_argument('--checkpoint', default=str(settings.BASE_DIR / '.cleanup_media.json'),
+                            help='Файл с прогрессом для продолжения после прерывания')
+        parser.add_argument('--reset', action='store_true',
+                            help='Игнорировать сохранённый прогресс и начать заново')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--batch-size и --workers должны быть положительными')
+
+        self.storage = default_storage
+        self.options = options
+        self.cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+        self.checkpoint = {} if options['reset'] else self._load_checkpoint()
+
+        prefixes = options['prefix'] or sorted(MEDIA_REFERENCES)
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            results = [self._process_prefix(pool, prefix) for prefix in prefixes]
+
+        if not options['dry_run']:
+            # Проход по каталогам завершён — следующий запуск начнёт их с начала
+            self._finish(prefixes)
+
+        scanned = sum(r[0] for r in results)
+        removed = sum(r[1] for r in results)
+        freed = sum(r[2] for r in results)
+        verb = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено файлов: {scanned}. {verb}: {removed} ({freed / 1024 / 1024:.1f} МБ)'
+        ))
+
+    def _process_prefix(self, pool, prefix):
+        """Листает каталог один раз и раздаёт пачки имён потокам; возвращает (проверено, удалено, байт).
+
+        В очереди не больше двух пачек на поток, поэтому память не растёт с
+        размером каталога. Прогресс сохраняется по самой старой пачке очереди —
+        всё до неё уже обработано. В S3 листинг идёт по возрастанию имени, и
+        прерванный каталог продолжается после последней пачки; на локальном
+        диске порядок не гарантирован, поэтому там пропускаются только
+        завершённые каталоги.
+        """
+        state = self.checkpoint.get(prefix)
+        if state is True:
+            return 0, 0, 0
+        start_after = state if state and lists_in_order(self.storage) else ''
+
+        scanned = removed = freed = 0
+        pending = deque()
+
+        def wait_oldest():
+            nonlocal scanned, removed, freed
+            future, batch = pending.popleft()
+            batch_removed, batch_freed = future.result()
+            scanned, removed, freed = scanned + len(batch), removed + batch_removed, freed + batch_freed
+            if not self.options['dry_run']:
+                self._save_checkpoint(prefix, batch[-1])
+
+        batch = []
+        for name in iter_files(prefix, start_after, self.storage):
+            batch.append(name)
+            if len(batch) >= self.options['batch_size']:
+                pending.append((pool.submit(self._process_batch, batch, prefix), batch))
+                batch = []
+                if len(pending) >= self.options['workers'] * 2:
+                    wait_oldest()
+        if batch:
+            pending.append((pool.submit(self._process_batch, batch, prefix), batch))
+        while pending:
+            wait_oldest()
+
+        if not self.options['dry_run']:
+            self._save_checkpoint(prefix, True)
+        return scanned, removed, freed
+
+    def _process_batch(self, batch, prefix):
+        """Удаляет осиротевшие файлы пачки; возвращает (удалено, байт)"""
+        try:
+            removed = freed = 0
+            for name in self._orphans(batch, MEDIA_REFERENCES[prefix]):
+                if self.storage.get_modified_time(name) > self.cutoff:
+                    continue
+                size = self.storage.size(name)
+                if self.options['dry_run']:
+                    self.stdout.write(f'  {name}')
+                else:
+                    self.storage.delete(name)
+                removed += 1
+                freed += size
+            return removed, freed
+        finally:
+            # Пачка выполняется в потоке пула — его соединение с БД не держим
+            connections.close_all()
+
+    def _orphans(self, batch, references):
+        """Имена из пачки, на которые нет ссылок: один IN-запрос на поле"""
+        referenced = set()
+        for model, field in references:
+            referenced.update(
+                model.objects.filter(**{f'{field}__in': batch}).values_list(field, flat=True)
+            )
+        return [name for name in batch if name not in referenced]
+
+    def _load_checkpoint(self):
+        try:
+            with open(self.options['checkpoint'], encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _save_checkpoint(self, prefix, state):
+        """Сохраняет последнее обработанное имя каталога; True — каталог пройден полностью"""
+        self.checkpoint[prefix] = state
+        with open(self.options['checkpoint'], 'w', encoding='utf-8') as f:
+            json.dump(self.checkpoint, f, ensure_ascii=False, indent=2)
+
+    def _finish(self, prefixes):
+        """Забывает прогресс пройденных каталогов; пустой файл прогресса удаляется"""
+        self.checkpoint = {
+            prefix: state for prefix, state in self.checkpoint.items()
+            if prefix not in prefixes
+        }
+        if self.checkpoint:
+            with open(self.options['checkpoint'], 'w', encoding='utf-8') as f:
+                json.dump(self.checkpoint, f, ensure_ascii=False, indent=2)
+        else:
+            try:
+                os.remove(self.options['checkpoint'])
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,174 @@
+"""Перекодирование сохранённых мемов и аватаров в более компактный формат"""
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from memes.cache import invalidate_user_cache
+from memes.imaging import reencode_image
+from memes.models import Mem, Profile
+
+
+# Цель -> (модель, поле с файлом)
+TARGETS = {
+    'mems': (Mem, 'custom_image'),
+    'avatars': (Profile, 'avatar'),
+}
+
+# Формат -> (имя для Pillow, расширение)
+FORMATS = {
+    'webp': ('WEBP', 'webp'),
+    'jpeg': ('JPEG', 'jpg'),
+}
+
+
+class Command(BaseCommand):
+    help = 'Перекодирует Mem.custom_image и Profile.avatar в WebP/JPEG и подменяет ссылки на файлы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(FORMATS), default='webp',
+                            help='Целевой формат')
+        parser.add_argument('--quality', type=int, default=80,
+                            help='Качество сжатия (1-100)')
+        parser.add_argument('--target', action='append', choices=sorted(TARGETS),
+                            help='Что перекодировать (по умолчанию всё)')
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Сколько записей брать за один запрос')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Количество процессов для кодирования')
+        parser.add_argument('--min-savings', type=float, default=0.1,
+                            help='Минимальная доля экономии, при которой файл заменяется')
+        parser.add_argument('--keep-originals', action='store_true',
+                            help='Не удалять исходные файлы после замены')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только посчитать экономию, ничего не менять')
+        parser.add_argument('--checkpoint', default=str(settings.BASE_DIR / '.reencode_media.json'),
+                            help='Файл с прогрессом для продолжения после прерывания')
+        parser.add_argument('--reset', action='store_true',
+                            help='Игнорировать сохранённый прогресс и начать заново')
+
+    def handle(self, *args, **options):
+        if not 1 <= options['quality'] <= 100:
+            raise CommandError('--quality должно быть от 1 до 100')
+        if options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--batch-size и --workers должны быть положительными')
+
+        self.options = options
+        self.storage = default_storage
+        self.image_format, self.ext = FORMATS[options['format']]
+        self.checkpoint = {} if options['reset'] else self._load_checkpoint()
+        self.stats = {'files': 0, 'replaced': 0, 'skipped': 0, 'bytes_read': 0, 'bytes_before': 0, 'bytes_after': 0}
+        started = time.monotonic()
+
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            for target in options['target'] or sorted(TARGETS):
+                self._process_target(target, pool)
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        saved = self.stats['bytes_before'] - self.stats['bytes_after']
+        verb = 'Можно заменить' if options['dry_run'] else 'Заменено'
+        self.stdout.write(self.style.SUCCESS(
+            f"Обработано файлов: {self.stats['files']}. {verb}: {self.stats['replaced']}, "
+            f"пропущено: {self.stats['skipped']}. "
+            f"Экономия: {saved / 1024 / 1024:.1f} МБ "
+            f"({self.stats['bytes_before'] / 1024 / 1024:.1f} → {self.stats['bytes_after'] / 1024 / 1024:.1f} МБ). "
+            f"Скорость: {self.stats['files'] / elapsed:.1f} файлов/с, "
+            f"{self.stats['bytes_read'] / 1024 / 1024 / elapsed:.2f} МБ/с"
+        ))
+
+    def _process_target(self, target, pool):
+        """Проход по таблице пачками по возрастанию pk (keyset), с сохранением прогресса"""
+        model, field = TARGETS[target]
+        last_pk = self.checkpoint.get(target, 0)
+
+        while True:
+            batch = list(
+                model.objects.filter(pk__gt=last_pk)
+                .exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+                .order_by('pk')
+                .values_list('pk', field)[:self.options['batch_size']]
+            )
+            if not batch:
+                break
+
+            todo = []
+            for pk, name in batch:
+                if name.lower().endswith(f'.{self.ext}'):
+                    continue
+                try:
+                    with self.storage.open(name, 'rb') as f:
+                        todo.append((pk, name, f.read()))
+                except (FileNotFoundError, OSError):
+                    self.stderr.write(f'  нет файла: {name}')
+
+            results = pool.map(
+                reencode_image,
+                [data for _, _, data in todo],
+                [self.image_format] * len(todo),
+                [self.options['quality']] * len(todo),
+            )
+            for (pk, name, data), encoded in zip(todo, results):
+                self._swap(model, field, pk, name, data, encoded)
+
+            last_pk = batch[-1][0]
+            if not self.options['dry_run']:
+                self._save_checkpoint(target, last_pk)
+            self.stdout.write(f'{target}: до pk={last_pk}, обработано {self.stats["files"]}')
+
+    def _swap(self, model, field, pk, name, data, encoded):
+        """Сохраняет новый файл и только после проверки переключает на него запись"""
+        self.stats['files'] += 1
+        self.stats['bytes_read'] += len(data)
+        if encoded is None or len(encoded) > len(data) * (1 - self.options['min_savings']):
+            self.stats['skipped'] += 1
+            return
+
+        self.stats['replaced'] += 1
+        self.stats['bytes_before'] += len(data)
+        self.stats['bytes_after'] += len(encoded)
+        if self.options['dry_run']:
+            return
+
+        new_name = self.storage.save(f'{os.path.splitext(name)[0]}.{self.ext}', ContentFile(encoded))
+        self._fsync(new_name)
+        if not self.storage.exists(new_name) or self.storage.size(new_name) != len(encoded):
+            self.stderr.write(f'  не удалось записать {new_name}, оставляем {name}')
+            self.storage.delete(new_name)
+            return
+
+        # Условный UPDATE: если ссылку успели поменять, новый файл не нужен
+        updated = model.objects.filter(pk=pk, **{field: name}).update(**{field: new_name})
+        if not updated:
+            self.storage.delete(new_name)
+            return
+
+        if model is Profile:
+            invalidate_user_cache(model.objects.filter(pk=pk).values_list('user_id', flat=True).first())
+        if not self.options['keep_originals']:
+            self.storage.delete(name)
+
+    def _fsync(self, name):
+        """Сбрасывает локальный файл на диск; в S3 объект надёжен после успешного PUT"""
+        try:
+            path = self.storage.path(name)
+        except NotImplementedError:
+            return
+        with open(path, 'rb') as f:
+            os.fsync(f.fileno())
+
+    def _load_checkpoint(self):
+        try:
+            with open(self.options['checkpoint'], encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _save_checkpoint(self, target, last_pk):
+        self.checkpoint[target] = last_pk
+        with open(self.options['checkpoint'], 'w', encoding='utf-8') as f:
+            json.dump(self.checkpoint, f, indent=2)
@@ -0,0 +1,14 @@
+"""Пересчёт рейтинга популярности шаблонов (запускается по расписанию)"""
+from django.core.management.base import BaseCommand
+
+from memes.popularity import refresh_ranking
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рейтинг шаблонов по TemplateUsage и сохраняет новый снимок'
+
+    def handle(self, *args, **options):
+        ranking = refresh_ranking()
+        self.stdout.write(self.style.SUCCESS(
+            f'Снимок рейтинга #{ranking.pk}: {len(ranking.template_ids)} шаблонов'
+        ))
@@ -0,0 +1,101 @@
+import logging
+
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.http import JsonResponse
+from django.utils.functional import SimpleLazyObject
+
+from . import db_router
+from .cache import get_cached_user
+
+logger = logging.getLogger(__name__)
+
+
+class HealthCheckMiddleware:
+    """Отвечает на пробы /healthz и /readyz до остальных middleware.
+
+    Стоит первой в MIDDLEWARE: пробы не проходят через сессии,
+    аутентификацию, CSP и рендеринг шаблонов.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path == '/healthz':
+            # Процесс жив и принимает запросы; БД не трогаем
+            return JsonResponse({'status': 'ok'})
+        if request.path == '/readyz':
+            return self.readiness()
+        return self.get_response(request)
+
+    def readiness(self):
+        checks = {}
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            checks['database'] = 'ok'
+        except Exception:
+            # Подробности только в лог: проба доступна без аутентификации
+            logger.exception('Проверка готовности: база данных недоступна')
+            checks['database'] = 'error'
+
+        try:
+            # Запрос несуществующего имени проверяет доступ к хранилищу без листинга
+            default_storage.exists('.readyz')
+            checks['storage'] = 'ok'
+        except Exception:
+            logger.exception('Проверка готовности: хранилище недоступно')
+            checks['storage'] = 'error'
+
+        ready = all(value == 'ok' for value in checks.values())
+        return JsonResponse(
+            {'status': 'ok' if ready else 'error', 'checks': checks},
+            status=200 if ready else 503
+        )
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """AuthenticationMiddleware, берущая пользователя и профиль из кэша"""
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_cached_user(request))
+
+
+class PrimaryPinMiddleware:
+    """Закрепляет пользователя за основной БД после его записи.
+
+    Небезопасные методы (POST и т.п.) целиком идут в основную БД. Если за
+    запрос что-то записано, ставится cookie на DATABASE_PRIMARY_PIN_SECONDS,
+    и пока она жива, чтение тоже идёт с основной БД, а не с реплик.
+    """
+
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+
+        cookie = settings.DATABASE_PRIMARY_PIN_COOKIE
+        use_primary = request.method not in self.SAFE_METHODS or cookie in request.COOKIES
+        tokens = db_router.begin_request(use_primary)
+        try:
+            response = self.get_response(request)
+        finally:
+            written = db_router.end_request(tokens)
+
+        if written:
+            response.set_cookie(
+                cookie, '1',
+                max_age=settings.DATABASE_PRIMARY_PIN_SECONDS,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
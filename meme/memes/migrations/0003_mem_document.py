@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('memes', '0002_category_remove_meme_template_remove_meme_user_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mem',
+            name='document',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Документ редактора'),
+        ),
+        migrations.AddField(
+            model_name='mem',
+            name='document_version',
+            field=models.PositiveIntegerField(default=0, verbose_name='Версия документа'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 6.0 on 2026-10-19 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('memes', '0003_mem_document'),
+    ]
+
+    operations = [
+        # Связь с Sample убрана из моделей раньше, а миграции так и не догнали их:
+        # в БД остался внешний ключ на пустую таблицу. Значения не записывались,
+        # поэтому колонку можно пересоздать как обычный ID статического шаблона.
+        migrations.RemoveField(
+            model_name='mem',
+            name='sample',
+        ),
+        migrations.AddField(
+            model_name='mem',
+            name='sample_id',
+            field=models.IntegerField(blank=True, null=True, verbose_name='ID шаблона'),
+        ),
+        migrations.CreateModel(
+            name='TemplateUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('template_id', models.IntegerField(verbose_name='ID шаблона')),
+                ('day', models.DateField(verbose_name='День')),
+                ('opens', models.PositiveIntegerField(default=0, verbose_name='Открытий редактора')),
+                ('saves', models.PositiveIntegerField(default=0, verbose_name='Сохранений')),
+            ],
+            options={
+                'verbose_name': 'Использование шаблона',
+                'verbose_name_plural': 'Использование шаблонов',
+                'indexes': [models.Index(fields=['day'], name='memes_templateusage_day')],
+                'constraints': [models.UniqueConstraint(fields=('template_id', 'day'), name='memes_templateusage_template_day')],
+            },
+        ),
+        migrations.DeleteModel(
+            name='Sample',
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0 on 2026-10-19 19:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('memes', '0004_templateusage_mem_sample_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TemplateRanking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('template_ids', models.JSONField(default=list, verbose_name='ID шаблонов по убыванию популярности')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата расчёта')),
+            ],
+            options={
+                'verbose_name': 'Рейтинг шаблонов',
+                'verbose_name_plural': 'Рейтинги шаблонов',
+            },
+        ),
+    ]
@@ -34,6 +34,9 @@ class Mem(models.Model):
     name = models.CharField(max_length=200, verbose_name="Название", default='Мой мем')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     is_public = models.BooleanField(default=False, verbose_name="Публичный")
+    # Редактируемое состояние редактора (шаблон, тексты, позиции, стили); изображение — только экспорт
+    document = models.JSONField(default=dict, blank=True, verbose_name="Документ редактора")
+    document_version = models.PositiveIntegerField(default=0, verbose_name="Версия документа")
 
     def __str__(self):
         return f"{self.name} - {self.user.username}"
@@ -43,6 +46,40 @@ class Mem(models.Model):
         verbose_name_plural = "Мемы"
 
 
+class TemplateUsage(models.Model):
+    """Дневные счётчики использования статических шаблонов (для рейтинга популярности)"""
+    template_id = models.IntegerField(verbose_name="ID шаблона")
+    day = models.DateField(verbose_name="День")
+    opens = models.PositiveIntegerField(default=0, verbose_name="Открытий редактора")
+    saves = models.PositiveIntegerField(default=0, verbose_name="Сохранений")
+
+    def __str__(self):
+        return f"Шаблон #{self.template_id} за {self.day}"
+
+    class Meta:
+        verbose_name = "Использование шаблона"
+        verbose_name_plural = "Использование шаблонов"
+        constraints = [
+            models.UniqueConstraint(fields=['template_id', 'day'], name='memes_templateusage_template_day'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='memes_templateusage_day'),
+        ]
+
+
+class TemplateRanking(models.Model):
+    """Снимок рейтинга шаблонов; создаётся командой refresh_template_ranking"""
+    template_ids = models.JSONField(default=list, verbose_name="ID шаблонов по убыванию популярности")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Дата расчёта")
+
+    def __str__(self):
+        return f"Рейтинг от {self.created_at:%d.%m.%Y %H:%M}"
+
+    class Meta:
+        verbose_name = "Рейтинг шаблонов"
+        verbose_name_plural = "Рейтинги шаблонов"
+
+
 class Profile(models.Model):
     """Профиль пользователя"""
     user = models.OneToOneField(
@@ -0,0 +1,166 @@
+"""Популярность шаблонов: счётчики в памяти процесса, пакетная запись в БД, снимки рейтинга"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils import timezone
+
+from .models import TemplateRanking, TemplateUsage
+
+logger = logging.getLogger(__name__)
+
+# События и их вес в рейтинге: сохранение значит больше, чем открытие редактора
+OPEN = 'opens'
+SAVE = 'saves'
+EVENT_WEIGHTS = {OPEN: 1, SAVE: 3}
+
+RANKING_CACHE_KEY = 'memes:popular:v2'
+
+# (template_id, день, событие) -> количество, ещё не записанное в БД
+_buffer = Counter()
+_lock = threading.Lock()
+_flusher = None
+
+
+def record_usage(template_id, event):
+    """Учитывает событие шаблона в памяти; в БД его запишет фоновый поток"""
+    if template_id is None:
+        return
+
+    with _lock:
+        _buffer[(template_id, timezone.localdate(), event)] += 1
+    _ensure_flusher()
+
+
+def _ensure_flusher():
+    """Запускает поток записи в текущем процессе.
+
+    Стартует при первом событии, а не при импорте: с gunicorn --preload
+    потоки мастера не переживают fork, и у каждого воркера должен быть свой.
+    """
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    with _lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=_flush_loop, name='template-usage-flush', daemon=True)
+            _flusher.start()
+
+
+def _flush_loop():
+    """Раз в POPULARITY_FLUSH_INTERVAL пишет буфер в БД вне запросов"""
+    while True:
+        time.sleep(max(settings.POPULARITY_FLUSH_INTERVAL, 1))
+        try:
+            flush_usage()
+        finally:
+            # Соединение потока не держим открытым между записями
+            connections.close_all()
+
+
+def flush_usage():
+    """Пишет накопленные счётчики одним пакетным upsert; при ошибке возвращает их в буфер"""
+    with _lock:
+        pending = dict(_buffer)
+        _buffer.clear()
+    if not pending:
+        return 0
+
+    rows = {}
+    for (template_id, day, event), count in pending.items():
+        row = rows.setdefault((template_id, day), {OPEN: 0, SAVE: 0})
+        row[event] += count
+
+    # Напрямую в основную БД: через роутер запись пометила бы текущий запрос
+    # как пишущий и закрепила бы пользователя за основной БД (PrimaryPinMiddleware)
+    connection = connections[DEFAULT_DB_ALIAS]
+    table = connection.ops.quote_name(TemplateUsage._meta.db_table)
+    # ON CONFLICT ... DO UPDATE одинаково работает в PostgreSQL и SQLite
+    sql = (
+        f'INSERT INTO {table} (template_id, day, opens, saves) VALUES (%s, %s, %s, %s) '
+        f'ON CONFLICT (template_id, day) DO UPDATE SET '
+        f'opens = {table}.opens + excluded.opens, saves = {table}.saves + excluded.saves'
+    )
+    try:
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, [
+                (template_id, day, row[OPEN], row[SAVE])
+                for (template_id, day), row in rows.items()
+            ])
+    except DatabaseError:
+        logger.exception('Не удалось записать счётчики шаблонов, повторим позже')
+        with _lock:
+            _buffer.update(pending)
+        return 0
+    return len(rows)
+
+
+# Остаток буфера записывается при остановке воркера
+atexit.register(flush_usage)
+
+
+def compute_ranking():
+    """ID шаблонов по убыванию популярности за POPULARITY_WINDOW_DAYS.
+
+    Вклад каждого дня затухает вдвое за POPULARITY_HALF_LIFE_DAYS,
+    поэтому свежие события весят больше старых.
+    """
+    today = timezone.localdate()
+    since = today - timedelta(days=settings.POPULARITY_WINDOW_DAYS - 1)
+    scores = Counter()
+    usage = TemplateUsage.objects.filter(day__gte=since).values_list('template_id', 'day', 'opens', 'saves')
+    for template_id, day, opens, saves in usage:
+        decay = 0.5 ** ((today - day).days / settings.POPULARITY_HALF_LIFE_DAYS)
+        scores[template_id] += (opens * EVENT_WEIGHTS[OPEN] + saves * EVENT_WEIGHTS[SAVE]) * decay
+    return [template_id for template_id, _ in scores.most_common()]
+
+
+def refresh_ranking():
+    """Сохраняет новый снимок рейтинга и удаляет устаревшие.
+
+    Вызывается вне запросов командой refresh_template_ranking (cron). Старые
+    снимки хранятся POPULARITY_RANKING_RETENTION_HOURS: курсоры галереи
+    ссылаются на снимок, поэтому подгрузка страниц не прыгает при пересчёте.
+    """
+    ranking = TemplateRanking.objects.create(template_ids=compute_ranking())
+    expired = timezone.now() - timedelta(hours=settings.POPULARITY_RANKING_RETENTION_HOURS)
+    TemplateRanking.objects.filter(created_at__lt=expired).exclude(pk=ranking.pk).delete()
+    cache.delete(RANKING_CACHE_KEY)
+    return ranking
+
+
+def current_ranking():
+    """(id снимка, id шаблонов) последнего рейтинга; (0, []) — рейтинга ещё нет"""
+    ranking = cache.get(RANKING_CACHE_KEY)
+    if ranking is None:
+        latest = TemplateRanking.objects.order_by('-created_at', '-pk').values_list('pk', 'template_ids').first()
+        ranking = latest or (0, [])
+        cache.set(RANKING_CACHE_KEY, ranking, settings.POPULARITY_RANKING_CACHE_TIMEOUT)
+    return ranking
+
+
+def get_ranking(ranking_id):
+    """id шаблонов снимка ranking_id или None, если снимок уже удалён"""
+    if ranking_id == 0:
+        return []
+    key = f'{RANKING_CACHE_KEY}:{ranking_id}'
+    template_ids = cache.get(key)
+    if template_ids is None:
+        template_ids = TemplateRanking.objects.filter(pk=ranking_id).values_list('template_ids', flat=True).first()
+        if template_ids is None:
+            return None
+        # Снимки неизменны
+        cache.set(key, template_ids, settings.POPULARITY_RANKING_RETENTION_HOURS * 3600)
+    return template_ids
+
+
+def sort_by_popularity(templates, template_ids):
+    """Шаблоны в порядке рейтинга template_ids; остальные — в порядке каталога"""
+    rank = {template_id: index for index, template_id in enumerate(template_ids)}
+    return sorted(templates, key=lambda t: rank.get(t['id'], len(rank)))
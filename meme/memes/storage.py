@@ -0,0 +1,142 @@
+"""Работа с хранилищем медиа: прямая загрузка из браузера (presigned PUT), постраничный листинг"""
+import os
+import secrets
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+
+try:
+    from storages.backends.s3 import S3Storage
+except ImportError:  # django-storages не установлен — только локальный диск
+    S3Storage = None
+
+
+UPLOAD_SALT = 'memes.upload'
+
+# MIME-тип -> (расширение, сигнатура начала файла)
+ALLOWED_IMAGE_TYPES = {
+    'image/png': ('png', b'\x89PNG\r\n\x1a\n'),
+    'image/jpeg': ('jpg', b'\xff\xd8\xff'),
+    'image/webp': ('webp', b'RIFF'),
+}
+
+
+def supports_direct_upload(storage=None):
+    """Можно ли загружать файлы в хранилище напрямую из браузера"""
+    storage = storage or default_storage
+    return S3Storage is not None and isinstance(storage, S3Storage)
+
+
+def create_upload(user, content_type, size, storage=None):
+    """Выдаёт подписанный URL для PUT ровно size байт и билет для последующей финализации"""
+    storage = storage or default_storage
+    ext, _ = ALLOWED_IMAGE_TYPES[content_type]
+    name = f'user_memes/meme_{user.id}_{int(time.time())}_{secrets.token_hex(4)}.{ext}'
+
+    # ContentType и ContentLength входят в подпись (SigV4): загрузить по этому URL
+    # файл другого типа или размера нельзя — браузер сам шлёт Content-Length = blob.size
+    upload_url = storage.connection.meta.client.generate_presigned_url(
+        'put_object',
+        Params={
+            'Bucket': storage.bucket_name,
+            'Key': storage._normalize_name(name),
+            'ContentType': content_type,
+            'ContentLength': size,
+        },
+        ExpiresIn=settings.MEME_UPLOAD_URL_EXPIRE,
+        HttpMethod='PUT',
+    )
+    ticket = signing.dumps(
+        {'name': name, 'user_id': user.id, 'content_type': content_type, 'size': size},
+        salt=UPLOAD_SALT,
+    )
+    return {
+        'upload_url': upload_url,
+        'headers': {'Content-Type': content_type},
+        'ticket': ticket,
+        'max_size': settings.MEME_UPLOAD_MAX_SIZE,
+    }
+
+
+def read_upload_ticket(ticket, user):
+    """Проверяет подпись и владельца билета, возвращает его содержимое"""
+    data = signing.loads(ticket, salt=UPLOAD_SALT, max_age=settings.MEME_UPLOAD_URL_EXPIRE * 2)
+    if data.get('user_id') != user.id:
+        raise signing.BadSignature('Билет выдан другому пользователю')
+    return data
+
+
+def _read_head(name, length, storage):
+    """Первые байты файла; для S3 — ranged GET, без скачивания объекта целиком"""
+    if supports_direct_upload(storage):
+        obj = storage.bucket.Object(storage._normalize_name(name))
+        return obj.get(Range=f'bytes=0-{length - 1}')['Body'].read()
+    with storage.open(name, 'rb') as f:
+        return f.read(length)
+
+
+def verify_upload(name, content_type, size=None, storage=None):
+    """Проверяет загруженный файл; при ошибке удаляет его и возвращает текст ошибки"""
+    storage = storage or default_storage
+    if not storage.exists(name):
+        return 'Файл не найден в хранилище'
+
+    error = None
+    _, signature = ALLOWED_IMAGE_TYPES[content_type]
+    actual_size = storage.size(name)
+    if actual_size > settings.MEME_UPLOAD_MAX_SIZE:
+        error = 'Файл слишком большой'
+    elif size is not None and actual_size != size:
+        error = 'Размер файла не совпадает с заявленным'
+    else:
+        head = _read_head(name, 12, storage)
+        if not head.startswith(signature) or (content_type == 'image/webp' and head[8:12] != b'WEBP'):
+            error = 'Неверный тип файла'
+
+    if error:
+        storage.delete(name)
+    return error
+
+
+def iter_files(prefix, start_after='', storage=None):
+    """Имена всех файлов под prefix (рекурсивно), без загрузки списка целиком в память.
+
+    В S3 — постранично через list_objects_v2 по возрастанию имени, начиная
+    после start_after. На локальном диске — os.scandir в порядке файловой
+    системы; там порядок не гарантирован, и start_after не поддерживается
+    (см. lists_in_order).
+    """
+    storage = storage or default_storage
+    if not supports_direct_upload(storage):
+        yield from _scan(prefix, storage)
+        return
+
+    key_prefix = storage._normalize_name(prefix)
+    root = key_prefix[:len(key_prefix) - len(prefix)]
+    params = {'Bucket': storage.bucket_name, 'Prefix': key_prefix}
+    if start_after:
+        params['StartAfter'] = root + start_after
+    paginator = storage.connection.meta.client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(**params):
+        for obj in page.get('Contents', []):
+            yield obj['Key'][len(root):]
+
+
+def lists_in_order(storage=None):
+    """Отдаёт ли iter_files имена по возрастанию (и можно ли продолжить с start_after)"""
+    return supports_direct_upload(storage)
+
+
+def _scan(directory, storage):
+    try:
+        entries = os.scandir(storage.path(directory))
+    except FileNotFoundError:
+        return
+    with entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _scan(f'{directory}{entry.name}/', storage)
+            else:
+                yield f'{directory}{entry.name}'
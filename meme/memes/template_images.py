@@ -0,0 +1,54 @@
+"""Метаданные изображений шаблонов для редактора: размеры и заглушка низкого разрешения"""
+import base64
+import io
+import logging
+from functools import lru_cache
+
+from django.contrib.staticfiles import finders
+from django.templatetags.static import static
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Ширина заглушки: ~1 КБ в base64, рисуется сразу, пока грузится оригинал
+PLACEHOLDER_SIZE = 32
+
+
+@lru_cache(maxsize=None)
+def template_image_info(image_name):
+    """Размеры файла из static/meme_templates и data: URI его уменьшенной копии.
+
+    Статика не меняется между деплоями, поэтому результат кэшируется на процесс.
+    """
+    path = finders.find(f'meme_templates/{image_name}')
+    if not path:
+        return {}
+    try:
+        with Image.open(path) as image:
+            width, height = image.size
+            # Для JPEG draft() декодирует сразу в уменьшенном масштабе
+            image.draft('RGB', (PLACEHOLDER_SIZE * 2, PLACEHOLDER_SIZE * 2))
+            preview = image.convert('RGB')
+            preview.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+            output = io.BytesIO()
+            preview.save(output, format='JPEG', quality=60)
+    except OSError:
+        logger.warning('Не удалось прочитать изображение шаблона %s', image_name)
+        return {}
+
+    return {
+        'width': width,
+        'height': height,
+        'placeholder': 'data:image/jpeg;base64,' + base64.b64encode(output.getvalue()).decode('ascii'),
+    }
+
+
+def editor_template_data(template):
+    """Всё, что нужно редактору для отрисовки шаблона без запроса к API"""
+    return {
+        'id': template['id'],
+        'name': template['name'],
+        'category': template['category'],
+        'image_url': static(f"meme_templates/{template['image_name']}"),
+        **template_image_info(template['image_name']),
+    }
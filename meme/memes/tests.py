@@ -1,3 +1,177 @@
-from django.test import TestCase
+import json
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import signing
+from django.test import SimpleTestCase, TestCase
+
+from .documents import DocumentError, apply_patch, validate_document
+from .models import Mem
+from .storage import UPLOAD_SALT
+
+
+def make_document(*texts):
+    return {'template_id': 2, 'texts': [dict(text) for text in texts]}
+
+
+TOP = {'text': 'Верх', 'x': 0.5, 'y': 0.1}
+BOTTOM = {'text': 'Низ', 'x': 0.5, 'y': 0.9}
+
+
+class ApplyPatchTests(SimpleTestCase):
+    def test_add_appends_with_dash(self):
+        document = apply_patch(make_document(TOP), [{'op': 'add', 'path': '/texts/-', 'value': BOTTOM}])
+        self.assertEqual(document['texts'], [TOP, BOTTOM])
+
+    def test_add_inserts_at_index(self):
+        document = apply_patch(make_document(TOP), [{'op': 'add', 'path': '/texts/0', 'value': BOTTOM}])
+        self.assertEqual(document['texts'], [BOTTOM, TOP])
+
+    def test_add_at_length_appends(self):
+        document = apply_patch(make_document(TOP), [{'op': 'add', 'path': '/texts/1', 'value': BOTTOM}])
+        self.assertEqual(document['texts'], [TOP, BOTTOM])
+
+    def test_add_past_end_fails(self):
+        with self.assertRaises(DocumentError):
+            apply_patch(make_document(TOP), [{'op': 'add', 'path': '/texts/2', 'value': BOTTOM}])
+
+    def test_replace_nested_value(self):
+        document = apply_patch(make_document(TOP), [{'op': 'replace', 'path': '/texts/0/x', 'value': 0.25}])
+        self.assertEqual(document['texts'][0]['x'], 0.25)
+
+    def test_replace_missing_key_fails(self):
+        with self.assertRaises(DocumentError):
+            apply_patch(make_document(TOP), [{'op': 'replace', 'path': '/texts/0/color', 'value': '#fff'}])
+
+    def test_replace_dash_fails(self):
+        with self.assertRaises(DocumentError):
+            apply_patch(make_document(TOP), [{'op': 'replace', 'path': '/texts/-', 'value': BOTTOM}])
+
+    def test_remove_list_item(self):
+        document = apply_patch(make_document(TOP, BOTTOM), [{'op': 'remove', 'path': '/texts/0'}])
+        self.assertEqual(document['texts'], [BOTTOM])
+
+    def test_remove_out_of_range_fails(self):
+        with self.assertRaises(DocumentError):
+            apply_patch(make_document(TOP), [{'op': 'remove', 'path': '/texts/1'}])
+
+    def test_remove_missing_key_fails(self):
+        with self.assertRaises(DocumentError):
+            apply_patch(make_document(TOP), [{'op': 'remove', 'path': '/texts/0/color'}])
+
+    def test_missing_value_fails(self):
+        with self.assertRaises(DocumentError):
+            apply_patch(make_document(TOP), [{'op': 'add', 'path': '/texts/-'}])
+
+    def test_path_inside_scalar_fails(self):
+        with self.assertRaises(DocumentError):
+            apply_patch(make_document(TOP), [{'op': 'add', 'path': '/texts/0/text/x', 'value': 1}])
+        with self.assertRaises(DocumentError):
+            apply_patch(make_document(TOP), [{'op': 'add', 'path': '/texts/0/text/x/y', 'value': 1}])
+
+    def test_non_numeric_index_fails(self):
+        with self.assertRaises(DocumentError):
+            apply_patch(make_document(TOP), [{'op': 'replace', 'path': '/texts/first/x', 'value': 1}])
+
+    def test_escaped_pointer(self):
+        document = apply_patch({'a/b': 1, 'c~d': 2}, [
+            {'op': 'replace', 'path': '/a~1b', 'value': 3},
+            {'op': 'remove', 'path': '/c~0d'},
+        ])
+        self.assertEqual(document, {'a/b': 3})
+
+    def test_invalid_operations_fail(self):
+        for operations in ({}, [1], [{'op': 'move', 'path': '/texts/0'}], [{'op': 'add', 'path': 'texts'}]):
+            with self.subTest(operations=operations), self.assertRaises(DocumentError):
+                apply_patch(make_document(TOP), operations)
+
+    def test_original_is_not_modified(self):
+        original = make_document(TOP)
+        apply_patch(original, [{'op': 'replace', 'path': '/texts/0/x', 'value': 0.25}])
+        self.assertEqual(original, make_document(TOP))
+
+
+class ValidateDocumentTests(SimpleTestCase):
+    def test_valid_document_gets_schema(self):
+        document = validate_document(make_document(dict(TOP, fontSize=36, align='center', color='#fff')))
+        self.assertEqual(document['schema'], 1)
+
+    def test_texts_required(self):
+        with self.assertRaises(DocumentError):
+            validate_document({'template_id': 2})
+
+    def test_invalid_documents(self):
+        cases = [
+            [],
+            {'texts': [], 'extra': 1},
+            {'template_id': True, 'texts': []},
+            {'template_id': '2', 'texts': []},
+            make_document({}),
+            make_document({'text': 'a', 'x': 0.5}),
+            make_document(dict(TOP, text=1)),
+            make_document(dict(TOP, x=True)),
+            make_document(dict(TOP, x='0.5')),
+            make_document(dict(TOP, x=float('nan'))),
+            make_document(dict(TOP, y=float('inf'))),
+            make_document(dict(TOP, fontSize=float('-inf'))),
+            make_document(dict(TOP, align='justify')),
+            make_document(dict(TOP, unknown=1)),
+        ]
+        for document in cases:
+            with self.subTest(document=document), self.assertRaises(DocumentError):
+                validate_document(document)
+
+    def test_too_many_texts(self):
+        with self.settings(MEME_DOCUMENT_MAX_TEXTS=1), self.assertRaises(DocumentError):
+            validate_document(make_document(TOP, BOTTOM))
+
+    def test_too_large(self):
+        with self.settings(MEME_DOCUMENT_MAX_SIZE=10), self.assertRaises(DocumentError):
+            validate_document(make_document(TOP))
+
+
+class MemeDocumentViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('author', password='password123')
+        self.client.force_login(self.user)
+
+    def post(self, url, body):
+        return self.client.post(url, body, content_type='application/json')
+
+    def test_non_finite_numbers_are_rejected(self):
+        response = self.post('/memes/memes/documents/', json.dumps({'document': make_document(TOP)}))
+        meme_id = response.json()['meme_id']
+
+        response = self.post(
+            f'/memes/memes/documents/{meme_id}/',
+            '{"base_version": 1, "ops": [{"op": "replace", "path": "/texts/0/x", "value": NaN}]}'
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.post('/memes/memes/documents/', '{"document": {"texts": [{"text": "a", "x": Infinity, "y": 0}]}}')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Mem.objects.get(id=meme_id).document['texts'][0]['x'], 0.5)
+
+    def test_bad_request_has_generic_error(self):
+        response = self.post('/memes/memes/documents/', '[1]')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Некорректный запрос')
+
+
+class FinalizeUploadTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('uploader', password='password123')
+        self.client.force_login(self.user)
+
+    def test_repeated_finalize_returns_existing_meme(self):
+        name = f'user_memes/meme_{self.user.id}_1_abcd.png'
+        meme = Mem.objects.create(user=self.user, name='Мем #1', custom_image=name)
+        ticket = signing.dumps(
+            {'name': name, 'user_id': self.user.id, 'content_type': 'image/png', 'size': 100},
+            salt=UPLOAD_SALT
+        )
+
+        response = self.client.post(
+            '/memes/memes/upload/finalize/', json.dumps({'ticket': ticket}), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['meme_id'], meme.id)
+        self.assertEqual(Mem.objects.filter(custom_image=name).count(), 1)
@@ -9,7 +9,12 @@ urlpatterns = [
     path('memes/gallery/', views.template_gallery, name='gallery'),
     path('memes/editor/', views.MemeEditorView.as_view(), name='editor_new'),
     path('memes/editor/<int:template_id>/', views.MemeEditorView.as_view(), name='editor_with_template'),
+    path('memes/editor/meme/<int:meme_id>/', views.MemeEditorView.as_view(), name='editor_document'),
     path('memes/save/', views.save_meme_image, name='save_meme_image'),
+    path('memes/upload/request/', views.request_meme_upload, name='request_meme_upload'),
+    path('memes/upload/finalize/', views.finalize_meme_upload, name='finalize_meme_upload'),
+    path('memes/documents/', views.create_meme_document, name='create_meme_document'),
+    path('memes/documents/<int:meme_id>/', views.patch_meme_document, name='patch_meme_document'),
     path('memes/delete/<int:meme_id>/', views.delete_meme, name='delete_meme'),
     path('memes/profile/edit/', views.edit_profile, name='edit_profile'),
     path('memes/profile/', views.profile_page, name='profile_page'),
@@ -17,5 +22,6 @@ urlpatterns = [
     
     # API endpoints
     path('memes/api/templates/', views.get_template_api, name='api_templates'),
+    path('memes/api/categories/', views.get_categories_api, name='api_categories'),
     path('memes/api/template/<int:template_id>/', views.get_template_detail_api, name='api_template_detail'),
 ]
\ No newline at end of file
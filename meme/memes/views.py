@@ -1,4 +1,5 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
 from django.utils.decorators import method_decorator
 from django.views import View
 from django.contrib.auth.decorators import login_required
@@ -6,8 +7,15 @@ from django.contrib.auth import login
 from django.contrib.auth.forms import UserCreationForm
 from django import forms
 from django.contrib.auth.models import User
+from .documents import DocumentError, apply_patch, validate_document
 from .models import Mem, Profile
+from .popularity import OPEN, SAVE, current_ranking, get_ranking, record_usage, sort_by_popularity
+from .storage import ALLOWED_IMAGE_TYPES, create_upload, read_upload_ticket, supports_direct_upload, verify_upload
+from .template_images import editor_template_data, template_image_info
+from django.conf import settings
+from django.core import signing
 from django.db import OperationalError
+from django.db.models import Q
 import re
 from django.utils.html import escape
 from django.contrib import messages
@@ -15,8 +23,10 @@ import base64
 import time
 from django.core.files.base import ContentFile
 from django.http import JsonResponse
+from django.views.decorators.cache import cache_control
 from django.views.decorators.csrf import csrf_exempt
 import json
+from collections import Counter
 
 
 # === СТАТИЧНЫЕ ШАБЛОНЫ МЕМОВ ===
@@ -112,9 +122,79 @@ STATIC_TEMPLATES = [
 ]
 
 
+# Размер страницы галереи и API шаблонов
+TEMPLATE_PAGE_SIZE = 24
+TEMPLATE_PAGE_MAX_SIZE = 100
+TEMPLATE_API_FIELDS = ['id', 'name', 'category_name', 'image_url', 'editor_url']
+
+TEMPLATE_IDS = {t['id'] for t in STATIC_TEMPLATES}
+
+# Категории со счётчиками: каталог статичный, считаем один раз при импорте
+TEMPLATE_CATEGORIES = [
+    {"id": cat, "name": cat, "count": count}
+    for cat, count in sorted(Counter(t['category'] for t in STATIC_TEMPLATES).items())
+]
+
+
+def filter_templates(category_id='all', query='', ranking=()):
+    """Фильтрация шаблонов по категории и подстроке в названии, в порядке рейтинга ranking"""
+    templates = sort_by_popularity(STATIC_TEMPLATES, ranking)
+    if category_id != 'all':
+        templates = [t for t in templates if t['category'] == category_id]
+    if query:
+        templates = [t for t in templates if query.lower() in t['name'].lower()]
+    return templates
+
+
+def paginate_templates(templates, after_id, limit, ranking_id):
+    """Страница шаблонов после шаблона after_id; возвращает (страница, курсор следующей страницы).
+
+    Курсор «снимок-id» запоминает снимок рейтинга, по которому отсортирована
+    выдача: следующие страницы берутся в том же порядке, даже если рейтинг
+    успел пересчитаться.
+    """
+    if after_id is not None:
+        ids = [t['id'] for t in templates]
+        templates = templates[ids.index(after_id) + 1:] if after_id in ids else []
+    page = templates[:limit]
+    next_cursor = f"{ranking_id}-{page[-1]['id']}" if len(templates) > limit else None
+    return page, next_cursor
+
+
+def parse_template_cursor(cursor):
+    """'снимок-id' -> (id снимка рейтинга, id последнего полученного шаблона)"""
+    ranking_id, template_id = cursor.split('-')
+    return int(ranking_id), int(template_id)
+
+
+# Черновики автосохранения: документ есть, изображения ещё нет
+DRAFTS = Q(custom_image__isnull=True) | Q(custom_image='')
+
+
+def next_meme_name():
+    """Название нового мема; черновики не учитываются"""
+    return f"Мем #{Mem.objects.exclude(DRAFTS).count() + 1}"
+
+
+def catalog_template_id(template_id):
+    """ID шаблона из документа, если такой есть в каталоге"""
+    return template_id if template_id in TEMPLATE_IDS else None
+
+
+def serialize_template(template):
+    """Представление шаблона для API"""
+    return {
+        'id': template['id'],
+        'name': template['name'],
+        'category_name': template['category'],
+        'image_url': f"/static/meme_templates/{template['image_name']}",
+        'editor_url': reverse('memes:editor_with_template', args=[template['id']]),
+    }
+
+
 def home(request):
     """Главная страница"""
-    popular_templates = STATIC_TEMPLATES[:8]
+    popular_templates = sort_by_popularity(STATIC_TEMPLATES, current_ranking()[1])[:8]
     return render(request, 'memes/home.html', {
         'popular_templates': popular_templates,
     })
@@ -132,16 +212,15 @@ def template_gallery(request):
     category_id = request.GET.get('category', 'all')
     query = request.GET.get('q', '')
 
-    templates = STATIC_TEMPLATES
-    if category_id != 'all':
-        templates = [t for t in templates if t['category'] == category_id]
-    if query:
-        templates = [t for t in templates if query.lower() in t['name'].lower()]
+    ranking_id, ranking = current_ranking()
+    templates = filter_templates(category_id, query, ranking)
+    page, next_cursor = paginate_templates(templates, None, TEMPLATE_PAGE_SIZE, ranking_id)
 
-    categories = sorted(set(t['category'] for t in STATIC_TEMPLATES))
     return render(request, 'memes/gallery.html', {
-        'templates': templates,
-        'categories': categories,
+        'templates': page,
+        'next_cursor': next_cursor,
+        'page_size': TEMPLATE_PAGE_SIZE,
+        'categories': [c['name'] for c in TEMPLATE_CATEGORIES],
         'selected_category': category_id,
         'search_query': query,
     })
@@ -151,16 +230,58 @@ def template_gallery(request):
 class MemeEditorView(View):
     """Редактор мема: отображение и сохранение"""
 
-    def get(self, request, template_id=None):
+    def get(self, request, template_id=None, meme_id=None):
         template = None
         templates = STATIC_TEMPLATES[:8]
+        meme = None
+        if meme_id:
+            # Повторное открытие сохранённого документа
+            meme = get_object_or_404(Mem, id=meme_id, user=request.user)
+            template_id = meme.document.get('template_id')
         if template_id:
             template = next((t for t in STATIC_TEMPLATES if t['id'] == template_id), None)
+        if template and not meme:
+            record_usage(template['id'], OPEN)
 
-        return render(request, 'memes/editor.html', {
+        template_data = editor_template_data(template) if template else None
+        response = render(request, 'memes/editor.html', {
             'template': template,
+            'template_data': template_data,
             'templates': templates,
+            'meme': meme,
         })
+        if template_data:
+            # Браузер (или CDN через 103 Early Hints) начинает качать шаблон вместе с HTML;
+            # crossorigin совпадает с img.crossOrigin в редакторе, иначе preload не переиспользуется
+            response['Link'] = f"<{template_data['image_url']}>; rel=preload; as=image; crossorigin=anonymous"
+        return response
+
+
+def store_meme_image(user, image, meme_id=None, document=None):
+    """Создаёт мем с изображением или прикрепляет экспорт к существующему документу"""
+    if meme_id:
+        meme = get_object_or_404(Mem, id=meme_id, user=user)
+        if not meme.custom_image:
+            # Первое изображение черновика: теперь это полноценный мем
+            meme.name = next_meme_name()
+        meme.custom_image = image
+        meme.sample_id = catalog_template_id(meme.document.get('template_id'))
+        meme.save(update_fields=['name', 'custom_image', 'sample_id'])
+    else:
+        if document:
+            document = validate_document(document)
+        meme = Mem.objects.create(
+            user=user,
+            name=next_meme_name(),
+            sample_id=catalog_template_id((document or {}).get('template_id')),
+            custom_image=image,
+            is_public=False,
+            document=document or {},
+            document_version=1 if document else 0
+        )
+
+    record_usage(meme.sample_id, SAVE)
+    return meme
 
 
 @login_required
@@ -184,12 +305,7 @@ def save_meme_image(request):
                 name=f'meme_{request.user.id}_{int(time.time())}.{ext}'
             )
 
-            meme = Mem.objects.create(
-                user=request.user,
-                name=f"Мем #{Mem.objects.count() + 1}",
-                custom_image=image_file,
-                is_public=False
-            )
+            meme = store_meme_image(request.user, image_file, data.get('meme_id'), data.get('document'))
 
             return JsonResponse({
                 'success': True,
@@ -206,6 +322,134 @@ def save_meme_image(request):
     return JsonResponse({'success': False, 'error': 'Метод не разрешен'}, status=405)
 
 
+@login_required
+def request_meme_upload(request):
+    """Шаг 1 прямой загрузки: выдача presigned URL для PUT в хранилище"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Метод не разрешен'}, status=405)
+
+    if not supports_direct_upload():
+        # Локальное хранилище — клиент отправит изображение через save_meme_image
+        return JsonResponse({'success': True, 'direct': False})
+
+    try:
+        data = json.loads(request.body)
+        content_type = data.get('content_type')
+        size = int(data.get('size') or 0)
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({'success': False, 'error': 'Некорректный запрос'}, status=400)
+
+    if content_type not in ALLOWED_IMAGE_TYPES:
+        return JsonResponse({'success': False, 'error': 'Неподдерживаемый тип файла'}, status=400)
+    if size < 1:
+        return JsonResponse({'success': False, 'error': 'Не указан размер файла'}, status=400)
+    if size > settings.MEME_UPLOAD_MAX_SIZE:
+        return JsonResponse({'success': False, 'error': 'Файл слишком большой'}, status=400)
+
+    return JsonResponse({'success': True, 'direct': True, **create_upload(request.user, content_type, size)})
+
+
+@login_required
+def finalize_meme_upload(request):
+    """Шаг 2 прямой загрузки: проверка файла в хранилище и создание мема"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Метод не разрешен'}, status=405)
+
+    try:
+        data = json.loads(request.body)
+        upload = read_upload_ticket(data.get('ticket', ''), request.user)
+    except (ValueError, AttributeError, signing.BadSignature):
+        return JsonResponse({'success': False, 'error': 'Недействительный билет загрузки'}, status=400)
+
+    # Повтор с тем же билетом (ретрай клиента) возвращает уже созданный мем:
+    # второй мем с тем же файлом не создаётся, а verify_upload не удалит его файл
+    existing = Mem.objects.filter(user=request.user, custom_image=upload['name']).values_list('id', flat=True).first()
+    if existing:
+        return JsonResponse({'success': True, 'message': 'Мем сохранен', 'meme_id': existing})
+
+    error = verify_upload(upload['name'], upload['content_type'], upload.get('size'))
+    if error:
+        return JsonResponse({'success': False, 'error': error}, status=400)
+
+    try:
+        meme = store_meme_image(request.user, upload['name'], data.get('meme_id'), data.get('document'))
+    except DocumentError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'success': True,
+        'message': 'Мем сохранен',
+        'meme_id': meme.id
+    })
+
+
+@login_required
+def create_meme_document(request):
+    """Автосохранение: создание черновика мема из документа редактора (без изображения)"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Метод не разрешен'}, status=405)
+
+    try:
+        data = json.loads(request.body)
+        if not isinstance(data, dict):
+            raise ValueError
+        document = validate_document(data.get('document'))
+    except DocumentError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Некорректный запрос'}, status=400)
+
+    meme = Mem.objects.create(
+        user=request.user,
+        name="Черновик",
+        sample_id=catalog_template_id(document.get('template_id')),
+        is_public=False,
+        document=document,
+        document_version=1
+    )
+    return JsonResponse({'success': True, 'meme_id': meme.id, 'version': meme.document_version})
+
+
+@login_required
+def patch_meme_document(request, meme_id):
+    """Автосохранение: применение JSON Patch к документу с оптимистичной блокировкой.
+
+    Клиент присылает base_version — версию, от которой считал изменения.
+    Если документ успел измениться, возвращается 409 с актуальной версией.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Метод не разрешен'}, status=405)
+
+    meme = get_object_or_404(Mem.objects.only('id', 'document', 'document_version'), id=meme_id, user=request.user)
+    try:
+        data = json.loads(request.body)
+        if not isinstance(data, dict):
+            raise ValueError
+        base_version = int(data.get('base_version'))
+        document = validate_document(apply_patch(meme.document, data.get('ops')))
+    except DocumentError as e:
+        # Сообщения DocumentError составлены нами и безопасны для клиента
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except (ValueError, TypeError):
+        return JsonResponse({'success': False, 'error': 'Некорректный запрос'}, status=400)
+
+    # Версия проверяется в самом UPDATE: параллельный запрос не перетрёт изменения
+    updated = Mem.objects.filter(id=meme.id, document_version=base_version).update(
+        document=document,
+        document_version=base_version + 1
+    )
+    if not updated:
+        meme.refresh_from_db(fields=['document', 'document_version'])
+        return JsonResponse({
+            'success': False,
+            'error': 'Документ изменён в другой вкладке',
+            'version': meme.document_version,
+            'document': meme.document
+        }, status=409)
+
+    return JsonResponse({'success': True, 'version': base_version + 1})
+
+
 @login_required
 def delete_meme(request, meme_id):
     """Удаление мема"""
@@ -277,7 +521,8 @@ def register(request):
 @login_required
 def profile_page(request):
     """Страница профиля пользователя"""
-    mems = Mem.objects.filter(user=request.user)
+    # Черновики автосохранения без изображения видны только в «Моих мемах»
+    mems = Mem.objects.filter(user=request.user).exclude(DRAFTS)
     return render(request, 'memes/profile.html', {
         'mems': mems,
         'user': request.user
@@ -286,35 +531,62 @@ def profile_page(request):
 
 @csrf_exempt
 def get_template_api(request):
-    """API для получения списка шаблонов (из статики)"""
+    """API для получения списка шаблонов (из статики) с постраничной выдачей.
+
+    Шаблоны идут по убыванию популярности.
+    Параметры: category, q, limit, cursor (next_cursor предыдущей страницы)
+    и fields — список нужных полей через запятую, например fields=id,image_url.
+    """
     category_id = request.GET.get('category', 'all')
     query = request.GET.get('q', '')
 
-    templates = STATIC_TEMPLATES
-    if category_id != 'all':
-        templates = [t for t in templates if t['category'] == category_id]
-    if query:
-        templates = [t for t in templates if query.lower() in t['name'].lower()]
+    try:
+        limit = min(max(int(request.GET.get('limit', TEMPLATE_PAGE_SIZE)), 1), TEMPLATE_PAGE_MAX_SIZE)
+        cursor = parse_template_cursor(request.GET['cursor']) if request.GET.get('cursor') else None
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Некорректные limit или cursor'}, status=400)
+
+    fields = [f for f in request.GET.get('fields', '').split(',') if f] or TEMPLATE_API_FIELDS
+    unknown = set(fields) - set(TEMPLATE_API_FIELDS)
+    if unknown:
+        return JsonResponse({
+            'success': False,
+            'error': f"Неизвестные поля: {', '.join(sorted(unknown))}"
+        }, status=400)
+
+    ranking = None
+    after_id = None
+    if cursor:
+        ranking_id, after_id = cursor
+        ranking = get_ranking(ranking_id)
+    if ranking is None:
+        # Первая страница или снимок уже удалён — берём текущий рейтинг
+        ranking_id, ranking = current_ranking()
+
+    templates = filter_templates(category_id, query, ranking)
+    page, next_cursor = paginate_templates(templates, after_id, limit, ranking_id)
 
     templates_data = []
-    for t in templates:
-        templates_data.append({
-            'id': t['id'],
-            'name': t['name'],
-            'category_name': t['category'],
-            'image_url': f"/static/meme_templates/{t['image_name']}",
-            'editor_url': f'/memes/editor/{t["id"]}/'
-        })
-
-    categories_data = [{"id": cat, "name": cat} for cat in sorted(set(t['category'] for t in STATIC_TEMPLATES))]
+    for t in page:
+        item = serialize_template(t)
+        templates_data.append({f: item[f] for f in fields})
 
     return JsonResponse({
         'success': True,
         'templates': templates_data,
-        'categories': categories_data,
         'selected_category': category_id,
         'search_query': query,
-        'count': len(templates_data)
+        'count': len(templates),
+        'next_cursor': next_cursor,
+    })
+
+
+@cache_control(public=True, max_age=3600)
+def get_categories_api(request):
+    """API для получения категорий шаблонов с количеством шаблонов в каждой"""
+    return JsonResponse({
+        'success': True,
+        'categories': TEMPLATE_CATEGORIES,
     })
 
 
@@ -330,5 +602,7 @@ def get_template_detail_api(request, template_id):
         'name': escape(template['name']),
         'category': template['category'],
         'image_url': f"/static/meme_templates/{template['image_name']}",
+        'width': template_image_info(template['image_name']).get('width'),
+        'height': template_image_info(template['image_name']).get('height'),
         'created_at': '2025-01-01 00:00:00'
     })
\ No newline at end of file
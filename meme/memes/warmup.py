@@ -0,0 +1,43 @@
+"""Прогрев процесса при старте: импорты, каталог шаблонов, компиляция HTML-шаблонов, заглушки изображений"""
+import logging
+
+from django.template.loader import get_template
+from django.urls import reverse
+
+logger = logging.getLogger(__name__)
+
+# Шаблоны страниц, которые открывают сразу после деплоя
+WARMUP_TEMPLATES = [
+    'base.html',
+    'memes/home.html',
+    'memes/gallery.html',
+    'memes/editor.html',
+    'memes/profile.html',
+    'memes/user_memes.html',
+    'registration/login.html',
+]
+
+
+def warm_up():
+    """Загружает каталог и компилирует шаблоны, чтобы первые запросы не платили за это.
+
+    В БД не ходит, поэтому безопасна для gunicorn --preload (до fork воркеров).
+    """
+    from . import views  # каталог шаблонов и категории считаются при импорте
+
+    # Кэшированный загрузчик Django держит скомпилированные шаблоны в памяти процесса
+    for name in WARMUP_TEMPLATES:
+        try:
+            get_template(name)
+        except Exception:
+            logger.exception('Не удалось прогреть шаблон %s', name)
+
+    # Размеры и заглушки шаблонов для редактора (кэш на процесс)
+    from .template_images import template_image_info
+    for template in views.STATIC_TEMPLATES:
+        template_image_info(template['image_name'])
+
+    # Заполняет кэш резолвера URL
+    reverse('memes:home')
+    logger.info('Прогрев завершён: %d шаблонов, каталог из %d мемов',
+                len(WARMUP_TEMPLATES), len(views.STATIC_TEMPLATES))